@@ -2,22 +2,41 @@
 import asyncio
 import logging.config
 import os
-import re
+import shutil
 import subprocess
+import threading
 import time
-from typing import Union, Pattern, Optional
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple, Union
+
+try:
+    # Only available on unix, used to enlarge the FFMPEG output pipe.
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # This is added to speed up the initial opencv loading
 os.environ["OPENCV_VIDEOIO_MSMF_ENABLE_HW_TRANSFORMS"] = "0"
 
 # External Imports
 import cv2
-from fastapi import FastAPI, WebSocket
+from fastapi import BackgroundTasks, FastAPI, WebSocket
 from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.websockets import WebSocketDisconnect
-from starlette.responses import ContentStream
+import numpy
 import uvicorn
 
+try:
+    # Optional, used to encode the jpeg frames on an nvidia gpu.
+    from nvjpeg import NvJpeg
+except ImportError:
+    NvJpeg = None
+
+try:
+    # Optional, used to encode the jpeg frames with libjpeg-turbo without going through opencv.
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420, TJFLAG_FASTDCT
+except ImportError:
+    TurboJPEG = None
+
 # Getting the current/root File's location.
 ROOT_FILE: str = os.path.abspath(__file__)
 
@@ -61,130 +80,819 @@ KVM_NOT_CONNECTED_FILE_PATH: str = os.path.join(ROOT_DIRECTORY,
 with open(KVM_NOT_CONNECTED_FILE_PATH, "rb") as file_object:
     KVM_NOT_CONNECTED_IMAGE: bytes = file_object.read()
 
+# The multipart MIME framing around every jpeg frame.
+FRAME_HEADER: bytes = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+FRAME_TAIL: bytes = b"\r\n"
+
+# The final part sent when the kvm is disconnected, this closes the multipart stream.
+DISCONNECT_CHUNK: bytes = FRAME_HEADER + KVM_NOT_CONNECTED_IMAGE + FRAME_TAIL + b"--frame--\r\n"
+
+MJPEG_FOURCC: int = cv2.VideoWriter_fourcc(*"MJPG")
+# Media foundation, the only backend the kvm is opened with, names the packed 4:2:2 yuyv
+# format YUY2.
+YUY2_FOURCC: int = cv2.VideoWriter_fourcc(*"YUY2")
+
+# The formats the kvm frames can be read in. Mjpeg frames are compressed by the device
+# and streamed as they are, raw yuyv frames are encoded from yuv by libjpeg-turbo and
+# bgr frames are decoded by opencv and encoded with encode_kvm_frame.
+FRAME_FORMAT_MJPEG: str = "mjpeg"
+FRAME_FORMAT_YUYV: str = "yuyv"
+FRAME_FORMAT_BGR: str = "bgr"
+
+# Every jpeg image starts with the SOI marker.
+JPEG_START_OF_IMAGE: bytes = b'\xff\xd8'
+
+# The number of frames the KVM FPS is calculated over.
+FPS_SAMPLE_FRAME_COUNT: int = 30
 
-def read_kvm_video_frames(video_interface: cv2.VideoCapture) -> ContentStream:
-    """Reads frames from a kvm video interface and yield them as JPEG bytes.
+# OpenCV's default jpeg quality, used by every encoder so the stream looks the same.
+JPEG_QUALITY: int = 95
+
+# The nvjpeg encoder is created once for the server since setting up its cuda context
+# and device buffers is far more expensive than encoding a frame.
+NVJPEG_ENCODER = None
+
+if NvJpeg is not None:
+    try:
+        NVJPEG_ENCODER = NvJpeg()
+        BACKEND_LOGGER.info("Using nvjpeg to encode the kvm frames.")
+    except Exception as error:
+        BACKEND_LOGGER.warning(f"Couldn't initialise nvjpeg, falling back to the cpu: {error}")
+
+# A single libjpeg-turbo handle is reused for every frame, instead of creating a
+# compressor for each one.
+TURBOJPEG_ENCODER = None
+
+if TurboJPEG is not None:
+    try:
+        TURBOJPEG_ENCODER = TurboJPEG()
+    except Exception as error:
+        BACKEND_LOGGER.warning(f"Couldn't load libjpeg-turbo, falling back to opencv: {error}")
 
-    This function continuously reads frames from the specified kvm video
-    interface, converts them to JPEG format, and yields them as bytes.
-    The generator runs indefinitely until an exception occurs or if the client
-    has disconnected.
+
+def get_jpeg_buffer_size(width: int, height: int) -> int:
+    """Calculates the worst case size of a 4:2:0 jpeg image, as libjpeg-turbo does.
 
     Args:
-        video_interface (cv2.VideoCapture): The opencv video interface to the connected device.
+        width (int): The width of the image.
+        height (int): The height of the image.
 
-    Yields:
-        bytes: Frame data in multipart MIME format with JPEG content type.
+    Returns:
+        int: The size of the buffer needed to hold the jpeg image.
     """
-    frame_count = 0
+    # The image is encoded in 16x16 blocks, each pixel takes at most 2 bytes for the luma
+    # and 1 byte for the chroma, plus 2048 bytes for the headers.
+    padded_width: int = (width + 15) // 16 * 16
+    padded_height: int = (height + 15) // 16 * 16
 
-    # Start time for calculating FPS
-    start_time = time.time()
+    return padded_width * padded_height * 3 + 2048
 
-    try:
-        # Loop until the client connection exist
-        while True:
-            # Check if the camera capture is successfully opened
-            if not video_interface.isOpened():
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' +
-                       KVM_NOT_CONNECTED_IMAGE + b'\r\n')
-                yield b'--frame--\r\n'
-                BACKEND_LOGGER.info("The kvm interface is not opening, closing the stream.")
-                break
 
-            # Read a frame from the kvm video object
-            read_status, frame = video_interface.read()
+def encode_kvm_frame(frame: numpy.ndarray,
+                     jpeg_buffer: Optional[bytearray] = None) -> Union[bytes, memoryview]:
+    """Encodes a kvm frame to JPEG bytes.
 
-            if not read_status:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' +
-                       KVM_NOT_CONNECTED_IMAGE + b'\r\n')
-                yield b'--frame--\r\n'
-                BACKEND_LOGGER.info("Failed to read new kvm frame, closing the stream.")
-                break
-            else:
-                # Convert frame to JPEG format
-                _, encoded_image = cv2.imencode(".jpeg", frame)
+    The frame is encoded on the gpu using nvjpeg when it is available, otherwise
+    it is encoded on the cpu using libjpeg-turbo directly or, as the last resort,
+    using opencv.
 
-                image_bytes = encoded_image.tobytes()
-                BACKEND_LOGGER.info(f"Size of data: {int(len(image_bytes)/ 1024)} Kb.")
-                # Yield the frame data as multipart MIME with JPEG content type
-                yield b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + image_bytes + b"\r\n"
+    Args:
+        frame (numpy.ndarray): The BGR frame read from the kvm video interface.
+        jpeg_buffer (Optional[bytearray]): A buffer of get_jpeg_buffer_size bytes which
+            libjpeg-turbo encodes the frame into, it is reused for every frame. Required
+            when libjpeg-turbo is used.
 
-            frame_count += 1
+    Returns:
+        Union[bytes, memoryview]: The JPEG encoded frame. A memoryview is only valid until
+        the next frame is encoded into the same buffer.
+    """
+    if NVJPEG_ENCODER is not None:
+        return NVJPEG_ENCODER.encode(frame, JPEG_QUALITY)
 
-            # Check if one second has elapsed
-            if time.time() - start_time > 1:
-                # Calculate the current FPS
-                fps = frame_count / (time.time() - start_time)
+    if TURBOJPEG_ENCODER is not None:
+        _, encoded_image_size = TURBOJPEG_ENCODER.encode(frame,
+                                                         quality=JPEG_QUALITY,
+                                                         pixel_format=TJPF_BGR,
+                                                         jpeg_subsample=TJSAMP_420,
+                                                         flags=TJFLAG_FASTDCT,
+                                                         dst=jpeg_buffer)
 
-                BACKEND_LOGGER.info(f"KVM FPS: {int(fps)}.")
+        return memoryview(jpeg_buffer)[:encoded_image_size]
 
-                # Reset the frames count to zero
-                frame_count = 0
+    _, encoded_image = cv2.imencode(".jpeg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
 
-                # Reset the start time to the current time
-                start_time = time.time()
-    except GeneratorExit:
-        BACKEND_LOGGER.error("Exiting the generator for kvm.")
-    except Exception:
-        BACKEND_LOGGER.error("Exiting the function for kvm due to general exception.")
-    finally:
-        BACKEND_LOGGER.info("Closing the SSE connection.")
-        BACKEND_LOGGER.info(f"Releasing the KVM for the client.")
+    # The encoded image is a new array for every frame, hence it can be used without
+    # copying it into a bytes object.
+    return encoded_image.ravel().data
 
-        video_interface.release()
 
+def encode_kvm_yuyv_frame(frame: numpy.ndarray,
+                          width: int,
+                          height: int,
+                          i420_frame: numpy.ndarray) -> bytes:
+    """Encodes a raw yuyv kvm frame to JPEG bytes using libjpeg-turbo.
 
-@APP.get("/kvm-stream/", response_model=None)
-async def open_kvm_stream() -> Union[StreamingResponse, FileResponse]:
-    """Open a KVM streaming endpoint to capture frames from the connected device.
+    The packed 4:2:2 frame is rearranged into planar 4:2:0, which is what the jpeg
+    holds anyway, so the frame is never converted to BGR and back to yuv.
 
-    This endpoint uses FastAPI's StreamingResponse to continuously
-    stream frames captured from the open cv interface. The frames
-    are sent with the specified media type "multipart/x-mixed-replace;
-    boundary=frame".
+    Args:
+        frame (numpy.ndarray): The raw yuyv frame read from the kvm video interface.
+        width (int): The width of the frame.
+        height (int): The height of the frame.
+        i420_frame (numpy.ndarray): A buffer of width * height * 3 / 2 bytes, which is
+            reused for every frame to hold the planar frame.
 
     Returns:
-        Union[StreamingResponse, FileResponse]: Either a StreamingResponse that
-        continuously streams frames from the kvm display or a FileResponse
-        with a jpeg image as fallback.
+        bytes: The JPEG encoded frame.
+    """
+    # Every 4 bytes hold 2 pixels as Y0 U Y1 V.
+    yuyv_frame: numpy.ndarray = frame.reshape(height, width // 2, 4)
+
+    luma_size: int = width * height
+    chroma_size: int = luma_size // 4
+
+    i420_frame[:luma_size].reshape(height, width)[:] = yuyv_frame.reshape(height, width, 2)[:, :, 0]
+
+    # The chroma of every other row is dropped to go from 4:2:2 to 4:2:0.
+    i420_frame[luma_size:luma_size + chroma_size].reshape(height // 2, width // 2)[:] = (
+        yuyv_frame[::2, :, 1])
+    i420_frame[luma_size + chroma_size:].reshape(height // 2, width // 2)[:] = (
+        yuyv_frame[::2, :, 3])
+
+    return TURBOJPEG_ENCODER.encode_from_yuv(i420_frame,
+                                             height,
+                                             width,
+                                             quality=JPEG_QUALITY,
+                                             jpeg_subsample=TJSAMP_420,
+                                             flags=TJFLAG_FASTDCT)
+
+
+def open_kvm_video_interface() -> Optional[Tuple[cv2.VideoCapture, str]]:
+    """Opens the kvm video interface and negotiates the format of its frames.
+
+    The kvm is asked for mjpeg frames first, then for raw yuyv frames if libjpeg-turbo
+    can encode them, and a first frame is read to check that the kvm is connected and
+    that the requested format is honoured.
+
+    Returns:
+        Optional[Tuple[cv2.VideoCapture, str]]: The opened video interface and the format
+        of its frames, or None if no frame could be read from the kvm.
     """
     video_index: int = 0
     backend_api: int = cv2.CAP_MSMF
     video_interface: cv2.VideoCapture = cv2.VideoCapture(video_index, backend_api)
+
+    # Most usb kvm devices compress the frames to mjpeg on the device, requesting that
+    # format lets the frames be streamed as they are instead of encoding them again.
+    video_interface.set(cv2.CAP_PROP_FOURCC, MJPEG_FOURCC)
     video_interface.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
     video_interface.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
     video_interface.set(cv2.CAP_PROP_FPS, 30)
 
+    frame_format: str = FRAME_FORMAT_BGR
+
+    if int(video_interface.get(cv2.CAP_PROP_FOURCC)) == MJPEG_FOURCC:
+        # Stop opencv from decoding the mjpeg frames, the compressed frame is then
+        # returned as a single row of bytes.
+        video_interface.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        frame_format = FRAME_FORMAT_MJPEG
+    elif TURBOJPEG_ENCODER is not None and NVJPEG_ENCODER is None:
+        # Without mjpeg, read the raw yuyv frames, libjpeg-turbo can encode them as they
+        # are, which skips opencv's conversion to BGR and the encoder's conversion back.
+        video_interface.set(cv2.CAP_PROP_FOURCC, YUY2_FOURCC)
+
+        if int(video_interface.get(cv2.CAP_PROP_FOURCC)) == YUY2_FOURCC:
+            video_interface.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+            frame_format = FRAME_FORMAT_YUYV
+
     try:
         # Read a frame from the kvm video object
         read_status, frame = video_interface.read()
 
         if not read_status:
-            return FileResponse(
-                KVM_NOT_CONNECTED_FILE_PATH,
-                media_type="image/jpeg")
+            video_interface.release()
+            return None
+
+        # Some backends ignore the convert rgb property and still return decoded
+        # frames, those frames have to be encoded from BGR.
+        is_raw_frame: bool = True
+
+        if frame_format == FRAME_FORMAT_MJPEG:
+            is_raw_frame = frame.ravel()[:2].tobytes() == JPEG_START_OF_IMAGE
+        elif frame_format == FRAME_FORMAT_YUYV:
+            frame_width: int = int(video_interface.get(cv2.CAP_PROP_FRAME_WIDTH))
+            frame_height: int = int(video_interface.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            is_raw_frame = frame.size == frame_width * frame_height * 2
+
+        if not is_raw_frame:
+            BACKEND_LOGGER.info(f"The kvm frames are not {frame_format}, encoding them instead.")
+            video_interface.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+            frame_format = FRAME_FORMAT_BGR
 
     except Exception:
+        video_interface.release()
+        return None
+
+    return video_interface, frame_format
+
+
+class KvmCaptureHub:
+    """Shares a single kvm video interface between every client of the mjpeg stream.
+
+    The kvm is opened when the first client subscribes. Every frame is read and encoded
+    once by a background task, and the resulting multipart chunk is put into the queue
+    of every client. The kvm is released once the last client has disconnected.
+    """
+
+    def __init__(self) -> None:
+        # Guards opening and releasing the kvm against clients subscribing meanwhile.
+        self._lock: asyncio.Lock = asyncio.Lock()
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._capture_task: Optional[asyncio.Task] = None
+
+        self._video_interface: Optional[cv2.VideoCapture] = None
+        self._frame_format: str = FRAME_FORMAT_BGR
+        self._frame_width: int = 0
+        self._frame_height: int = 0
+        self._i420_frame: Optional[numpy.ndarray] = None
+        self._jpeg_buffer: Optional[bytearray] = None
+
+    async def subscribe(self) -> Optional[asyncio.Queue]:
+        """Subscribes a client to the kvm frames, opening the kvm if it is not open yet.
+
+        Returns:
+            Optional[asyncio.Queue]: The queue the multipart chunks for the client are put
+            into, or None if the kvm could not be opened.
+        """
+        async with self._lock:
+            if self._capture_task is None or self._capture_task.done():
+                opened_video_interface = await asyncio.get_running_loop().run_in_executor(
+                    None, open_kvm_video_interface)
+
+                if opened_video_interface is None:
+                    return None
+
+                self._start_capture(*opened_video_interface)
+
+            # Only the latest chunk is kept for every client, so a slow client skips frames
+            # instead of stalling the capture for every other client.
+            frame_queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+            self._subscribers.add(frame_queue)
+
+            return frame_queue
+
+    def unsubscribe(self, frame_queue: asyncio.Queue) -> None:
+        """Unsubscribes a client, the kvm is released once no client is left.
+
+        Args:
+            frame_queue (asyncio.Queue): The queue returned by subscribe for the client.
+        """
+        self._subscribers.discard(frame_queue)
+
+    async def iter_frames(self, frame_queue: asyncio.Queue) -> AsyncIterator[bytes]:
+        """Yields the multipart chunks for a client until the kvm or the client disconnects.
+
+        Args:
+            frame_queue (asyncio.Queue): The queue returned by subscribe for the client.
+
+        Yields:
+            bytes: Frame data in multipart MIME format with JPEG content type.
+        """
+        try:
+            while True:
+                chunk: bytes = await frame_queue.get()
+
+                yield chunk
+
+                if chunk is DISCONNECT_CHUNK:
+                    break
+        finally:
+            BACKEND_LOGGER.info("Closing the SSE connection.")
+            self.unsubscribe(frame_queue)
+
+    def _start_capture(self, video_interface: cv2.VideoCapture, frame_format: str) -> None:
+        """Sets up the buffers for the opened kvm and starts the capture task.
+
+        Args:
+            video_interface (cv2.VideoCapture): The opened kvm video interface.
+            frame_format (str): The format of the frames read from the video interface.
+        """
+        BACKEND_LOGGER.info(f"Opened the KVM, reading {frame_format} frames.")
+
+        self._video_interface = video_interface
+        self._frame_format = frame_format
+        self._frame_width = int(video_interface.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self._frame_height = int(video_interface.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        if frame_format == FRAME_FORMAT_YUYV:
+            self._i420_frame = numpy.empty(self._frame_width * self._frame_height * 3 // 2,
+                                           dtype=numpy.uint8)
+
+        # The buffer libjpeg-turbo encodes the BGR frames into, so that no new buffer is
+        # allocated for every frame.
+        if (frame_format == FRAME_FORMAT_BGR and
+                TURBOJPEG_ENCODER is not None and
+                NVJPEG_ENCODER is None):
+            self._jpeg_buffer = bytearray(get_jpeg_buffer_size(self._frame_width,
+                                                               self._frame_height))
+
+        self._capture_task = asyncio.create_task(self._capture_frames())
+
+    async def _stop_capture(self) -> None:
+        """Releases the kvm and its buffers, must be called while holding the lock."""
+        BACKEND_LOGGER.info("Releasing the KVM.")
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None,
+                                                             self._video_interface.release)
+        except Exception as error:
+            BACKEND_LOGGER.error(f"Failed to release the KVM: {error}")
+        finally:
+            self._video_interface = None
+            self._i420_frame = None
+            self._jpeg_buffer = None
+            self._capture_task = None
+
+    def _read_jpeg_frame(self) -> Optional[Union[bytes, memoryview]]:
+        """Reads a frame from the kvm and encodes it to JPEG, this runs in the thread pool.
+
+        Returns:
+            Optional[Union[bytes, memoryview]]: The JPEG encoded frame, or None if the frame
+            could not be read.
+        """
+        try:
+            # Check if the camera capture is still opened
+            if not self._video_interface.isOpened():
+                BACKEND_LOGGER.info("The kvm interface is not opening, closing the streams.")
+                return None
+
+            # Read a frame from the kvm video object
+            read_status, frame = self._video_interface.read()
+
+            if not read_status:
+                BACKEND_LOGGER.info("Failed to read new kvm frame, closing the streams.")
+                return None
+
+            if self._frame_format == FRAME_FORMAT_MJPEG:
+                # The frame already holds the jpeg image compressed by the kvm, and is
+                # a new array for every read, hence it is used without copying it.
+                return frame.ravel().data
+
+            if self._frame_format == FRAME_FORMAT_YUYV:
+                return encode_kvm_yuyv_frame(frame,
+                                             self._frame_width,
+                                             self._frame_height,
+                                             self._i420_frame)
+
+            # Convert frame to JPEG format
+            return encode_kvm_frame(frame, self._jpeg_buffer)
+        except Exception as error:
+            BACKEND_LOGGER.error(f"Failed to capture a kvm frame, closing the streams: {error}")
+            return None
+
+    @staticmethod
+    def _put_latest(frame_queue: asyncio.Queue, chunk: bytes) -> None:
+        """Puts a chunk into a client's queue, replacing the chunk the client has not read yet.
+
+        Args:
+            frame_queue (asyncio.Queue): The queue of the client.
+            chunk (bytes): The multipart chunk to put into the queue.
+        """
+        if frame_queue.full():
+            frame_queue.get_nowait()
+
+        frame_queue.put_nowait(chunk)
+
+    async def _capture_frames(self) -> None:
+        """Reads and encodes the kvm frames, and hands them to every subscribed client.
+
+        However the capture ends, every client left is sent the disconnect chunk and the
+        kvm is released, so that the next client opens the kvm again.
+        """
+        loop = asyncio.get_running_loop()
+
+        frame_count = 0
+
+        # Start time for calculating FPS
+        start_time = time.monotonic()
+
+        try:
+            while True:
+                async with self._lock:
+                    if not self._subscribers:
+                        await self._stop_capture()
+                        return
+
+                image_bytes = await loop.run_in_executor(None, self._read_jpeg_frame)
+
+                if image_bytes is None:
+                    return
+
+                # The chunk is built once and shared by every client, the join also copies
+                # the frame out of the reused jpeg buffer.
+                chunk: bytes = b"".join((FRAME_HEADER, image_bytes, FRAME_TAIL))
+
+                for frame_queue in self._subscribers:
+                    self._put_latest(frame_queue, chunk)
+
+                frame_count += 1
+
+                # The FPS and the frame size are logged every 30 frames (around once a
+                # second), so the clock is not read and no log record is created for every
+                # frame.
+                if frame_count == FPS_SAMPLE_FRAME_COUNT:
+                    current_time = time.monotonic()
+
+                    # Calculate the current FPS
+                    fps = frame_count / (current_time - start_time)
+
+                    BACKEND_LOGGER.info("KVM FPS: %d.", fps)
+                    BACKEND_LOGGER.info("Size of data: %d Kb.", len(image_bytes) >> 10)
+
+                    # Reset the frames count to zero
+                    frame_count = 0
+
+                    # Reset the start time to the current time
+                    start_time = current_time
+        except Exception as error:
+            BACKEND_LOGGER.error(f"The KVM capture failed, closing the streams: {error}")
+        finally:
+            async with self._lock:
+                # The capture is already stopped if the last client has left, and a new
+                # capture may have been started since.
+                if self._capture_task is asyncio.current_task():
+                    for frame_queue in self._subscribers:
+                        self._put_latest(frame_queue, DISCONNECT_CHUNK)
+
+                    self._subscribers.clear()
+                    await self._stop_capture()
+
+
+KVM_CAPTURE_HUB: KvmCaptureHub = KvmCaptureHub()
+
+
+@APP.get("/kvm-stream/", response_model=None)
+async def open_kvm_stream() -> Union[StreamingResponse, FileResponse]:
+    """Open a KVM streaming endpoint to capture frames from the connected device.
+
+    This endpoint uses FastAPI's StreamingResponse to continuously
+    stream frames captured from the open cv interface. The frames
+    are sent with the specified media type "multipart/x-mixed-replace;
+    boundary=frame". Every client shares the same kvm video interface
+    through KVM_CAPTURE_HUB.
+
+    Returns:
+        Union[StreamingResponse, FileResponse]: Either a StreamingResponse that
+        continuously streams frames from the kvm display or a FileResponse
+        with a jpeg image as fallback.
+    """
+    frame_queue: Optional[asyncio.Queue] = await KVM_CAPTURE_HUB.subscribe()
+
+    if frame_queue is None:
         return FileResponse(
             KVM_NOT_CONNECTED_FILE_PATH,
             media_type="image/jpeg")
 
+    # The client is also unsubscribed once the response is done, since the generator
+    # never runs if the client disconnects before the response is started.
+    unsubscribe_task: BackgroundTasks = BackgroundTasks()
+    unsubscribe_task.add_task(KVM_CAPTURE_HUB.unsubscribe, frame_queue)
+
     try:
         # Return a StreamingResponse that continuously streams frames
         return StreamingResponse(
-            read_kvm_video_frames(video_interface),
-            media_type="multipart/x-mixed-replace;boundary=frame"
+            KVM_CAPTURE_HUB.iter_frames(frame_queue),
+            media_type="multipart/x-mixed-replace;boundary=frame",
+            background=unsubscribe_task
         )
 
     # If an exception occurs (e.g., video capture error)
     # Return an jpeg image response
     except Exception:
+        KVM_CAPTURE_HUB.unsubscribe(frame_queue)
         return FileResponse(KVM_NOT_CONNECTED_FILE_PATH, media_type="image/jpeg")
 
 
+# The 4 byte annexure b start code which prefixes every nal unit. It is searched with
+# bytes.find, which scans in C and needs no per match python callback.
+H264_NAL_START_CODE: bytes = b'\x00\x00\x00\x01'
+
+FFMPEG_EXECUTABLE_LOCATION: str = "/usr/bin/ffmpeg"
+
+# The capacity of the FFMPEG output pipe, and the size of the buffer it is read into. This
+# is large enough to hold an IDR frame (around 280KB), so a frame is read in one syscall.
+ENCODER_PIPE_SIZE: int = 1 << 20
+
+# The encoder is pinned by starting it through taskset, which applies the affinity before
+# FFMPEG creates its threads.
+TASKSET_EXECUTABLE_LOCATION: Optional[str] = shutil.which("taskset")
+
+# On linux machines with at least 4 cpus and taskset, the first 2 cpus are kept for the
+# server (the event loop and its threads) and the FFMPEG encoder is pinned to the rest, so
+# that the encoder and the server never preempt each other. Without taskset nothing is
+# pinned, since FFMPEG would inherit the server's 2 cpus.
+SERVER_CPUS: Set[int] = set()
+ENCODER_CPUS: Set[int] = set()
+
+if hasattr(os, "sched_getaffinity") and TASKSET_EXECUTABLE_LOCATION:
+    AVAILABLE_CPUS: List[int] = sorted(os.sched_getaffinity(0))
+
+    if len(AVAILABLE_CPUS) >= 4:
+        SERVER_CPUS = set(AVAILABLE_CPUS[:2])
+        ENCODER_CPUS = set(AVAILABLE_CPUS[2:])
+
+# The FFMPEG arguments of every supported h264 encoder, in the order of preference. The
+# hardware encoders run on a fixed function block, which leaves the cpu free, and libx264
+# is the software fallback which is always available.
+#
+# Encoders which upload the frames in a filter chain scale the frames in that chain, since
+# an output size would add a software scale after the upload, which fails on hardware frames.
+H264_ENCODER_ARGUMENTS: Dict[str, List[str]] = {
+    "h264_nvenc": [
+        '-c:v', 'h264_nvenc',
+        '-preset', 'p1',
+        '-tune', 'ull',
+        '-zerolatency', '1',
+        '-rc', 'cbr',
+        '-bf', '0',
+        '-g', '15',
+        '-pix_fmt', 'yuv420p',
+    ],
+    "h264_qsv": [
+        '-c:v', 'h264_qsv',
+        '-preset', 'veryfast',
+        '-async_depth', '1',
+        '-bf', '0',
+        '-g', '15',
+        '-pix_fmt', 'nv12',
+    ],
+    "h264_vaapi": [
+        '-vaapi_device', '/dev/dri/renderD128',
+        '-vf', 'scale=1920:1080,format=nv12,hwupload',
+        '-c:v', 'h264_vaapi',
+        '-bf', '0',
+        '-g', '15',
+    ],
+    "h264_v4l2m2m": [
+        '-c:v', 'h264_v4l2m2m',
+        '-b:v', '4M',
+        '-g', '15',
+        '-pix_fmt', 'yuv420p',
+    ],
+    "libx264": [
+        '-c:v', 'libx264',
+        '-preset', 'ultrafast',
+        '-tune', 'zerolatency',
+        '-pix_fmt', 'yuv420p',
+    ],
+}
+
+
+def build_h264_encoder_arguments(encoder_name: str) -> List[str]:
+    """Builds the FFMPEG output arguments of the KVM stream for the given h264 encoder.
+
+    Args:
+        encoder_name (str): The name of the encoder, a key of H264_ENCODER_ARGUMENTS.
+
+    Returns:
+        List[str]: The size, encoder, profile and level arguments of the KVM stream.
+    """
+    encoder_arguments: List[str] = H264_ENCODER_ARGUMENTS[encoder_name]
+    size_arguments: List[str] = [] if '-vf' in encoder_arguments else ['-s', '1920x1080']
+
+    return [
+        *size_arguments,
+        *encoder_arguments,
+        '-profile:v', 'high',
+        '-level', '4',
+    ]
+
+
+def detect_h264_encoder_arguments() -> List[str]:
+    """Finds the FFMPEG arguments of the preferred h264 encoder usable on this machine.
+
+    FFMPEG builds usually list hardware encoders even if the hardware is missing, hence
+    each encoder is probed by encoding a single test frame with the same output arguments
+    the KVM stream uses.
+
+    Returns:
+        List[str]: The FFMPEG arguments of the first encoder which could encode the test frame.
+    """
+    for encoder_name in H264_ENCODER_ARGUMENTS:
+        encoder_arguments: List[str] = build_h264_encoder_arguments(encoder_name)
+
+        probe_command = [
+            FFMPEG_EXECUTABLE_LOCATION,
+            '-hide_banner',
+            '-loglevel', 'error',
+            '-f', 'lavfi',
+            '-i', 'color=size=1280x720:duration=0.1',
+            *encoder_arguments,
+            '-frames:v', '1',
+            '-f', 'null',
+            '-'
+        ]
+
+        try:
+            probe_result = subprocess.run(probe_command,
+                                          stdout=subprocess.DEVNULL,
+                                          stderr=subprocess.DEVNULL,
+                                          timeout=10)
+        except FileNotFoundError:
+            BACKEND_LOGGER.warning(f"The FFMPEG executable is not found at: "
+                                   f"{FFMPEG_EXECUTABLE_LOCATION}, skipping the encoder probe.")
+            break
+        except Exception as error:
+            BACKEND_LOGGER.warning(f"Couldn't probe the {encoder_name} encoder: {error}")
+            continue
+
+        if probe_result.returncode == 0:
+            BACKEND_LOGGER.info(f"Using the {encoder_name} encoder for the KVM stream.")
+            return encoder_arguments
+
+    BACKEND_LOGGER.warning("No h264 encoder could be probed, falling back to libx264.")
+    return build_h264_encoder_arguments("libx264")
+
+
+# Probed once, on the first KVM stream instead of when the module is imported, since the
+# probe starts up to 5 FFMPEG processes.
+H264_ENCODER_ARGUMENTS_IN_USE: Optional[List[str]] = None
+H264_ENCODER_PROBE_LOCK: threading.Lock = threading.Lock()
+
+
+def get_h264_encoder_arguments() -> List[str]:
+    """Returns the FFMPEG arguments of the h264 encoder, probing the encoders on the first call.
+
+    The probe blocks for a few hundred milliseconds, hence this is run in the thread pool.
+
+    Returns:
+        List[str]: The FFMPEG output arguments of the KVM stream.
+    """
+    global H264_ENCODER_ARGUMENTS_IN_USE
+
+    with H264_ENCODER_PROBE_LOCK:
+        if H264_ENCODER_ARGUMENTS_IN_USE is None:
+            H264_ENCODER_ARGUMENTS_IN_USE = detect_h264_encoder_arguments()
+
+    return H264_ENCODER_ARGUMENTS_IN_USE
+
+
+# The number of complete frames which can wait to be sent to the client.
+FRAME_QUEUE_SIZE: int = 2
+
+
+def read_encoded_kvm_frames(encoder_output_fd: int,
+                            frame_queue: asyncio.Queue,
+                            loop: asyncio.AbstractEventLoop,
+                            stop_event: threading.Event) -> None:
+    """Reads the FFMPEG output and splits it into frames for the websocket.
+
+    This function runs in its own thread, so reading and parsing the encoder output
+    never waits on the websocket. It reads the h264 annexure b output with blocking
+    reads, combines the nal units into frames and puts the frames into the queue
+    read by the websocket coroutine. None is put into the queue once FFMPEG stops
+    producing data.
+
+    If the client falls behind and the queue is full, the delta frames are dropped
+    until the next key frame, since they can't be decoded without the frames before them.
+
+    Args:
+        encoder_output_fd (int): The file descriptor of the read end of the FFMPEG output pipe.
+        frame_queue (asyncio.Queue): The queue the complete frames (bytearray) are put into.
+        loop (asyncio.AbstractEventLoop): The event loop which owns the queue.
+        stop_event (threading.Event): Set by the websocket coroutine once it stops sending.
+    """
+    complete_frame_data: bytearray = bytearray()
+
+    # The buffer every read from the pipe is written into, it is reused for every read.
+    new_encoded_data: bytearray = bytearray(ENCODER_PIPE_SIZE)
+
+    # Slices of a memoryview reference the read chunk instead of copying it, so the
+    # nal data can be appended to the frame buffer without intermediate bytes objects.
+    new_encoded_data_view: memoryview = memoryview(new_encoded_data)
+
+    # The number of bytes at the start of the buffer left unparsed by the previous read. A
+    # start code (or the nal header following it) can be split between two reads, hence the
+    # last 4 bytes of every read are carried over and parsed together with the next read.
+    carried_data_size: int = 0
+
+    # Where the key frame (the SPS or IDR nal) starts in the frame buffer, key frames are
+    # combined with the delta frame before them.
+    key_frame_start: Optional[int] = None
+
+    # Set while delta frames are dropped, until the next key frame.
+    is_skipping_frames: bool = False
+
+    try:
+        while not stop_event.is_set():
+            try:
+                # Read whatever is available in the pipe, up to 1MB, after the carried bytes,
+                # this will not wait for the buffer to be filled.
+                read_data_size: int = os.readv(encoder_output_fd,
+                                               [new_encoded_data_view[carried_data_size:]])
+            except Exception as error:
+                BACKEND_LOGGER.error("Error while reading from FFMPEG process pipeline.")
+                BACKEND_LOGGER.error(error)
+                BACKEND_LOGGER.error("Exiting from the KVM Stream.")
+                break
+
+            if not read_data_size:
+                BACKEND_LOGGER.error("There is no data from FFMPEG process, exiting the stream.")
+                break
+
+            new_encoded_data_size: int = carried_data_size + read_data_size
+
+            # The bytes from here on are carried over to the next read.
+            parsed_data_size: int = max(new_encoded_data_size - len(H264_NAL_START_CODE), 0)
+
+            # Start codes are only searched up to the last byte, so that every start code
+            # found is followed by its nal header.
+            search_end: int = new_encoded_data_size - 1
+
+            # Find the first start code in the chunk.
+            nal_start: int = new_encoded_data.find(H264_NAL_START_CODE, 0, search_end)
+
+            if nal_start == -1:
+                # If there were no matches, it means the current chunk of data has
+                # intermediary Bytes which continues from previous data, hence they should
+                # simply be added to the Existing nal data.
+                complete_frame_data.extend(new_encoded_data_view[:parsed_data_size])
+            else:
+                # If the first match occurs somewhere not in the first index, then the first
+                # few bytes (before the start index of the first match) would correspond to
+                # the data from the previous nal unit, hence we need to add them to the
+                # existing nal data.
+                complete_frame_data.extend(new_encoded_data_view[:nal_start])
+
+            while nal_start != -1:
+                nal_type: int = new_encoded_data[nal_start + 4] & 0x1F
+
+                # We send only if the current nal is Non-Idr, since other data such as SPS,
+                # PPS, SEI, IDR would actually come as separate chunks, we need to combine
+                # them before sending. The implementation takes care of combining them, but
+                # happens only if a Non-Idr frame comes After the Key Frame (which is a
+                # combination of SPS, PPS, SEI, IDR).
+                if complete_frame_data and nal_type == 1:
+                    if stop_event.is_set():
+                        break
+
+                    if key_frame_start is not None:
+                        # The delta frame before the key frame references dropped frames.
+                        if is_skipping_frames:
+                            del complete_frame_data[:key_frame_start]
+                            is_skipping_frames = False
+
+                        # Key frames are never dropped, wait for space in the queue.
+                        #
+                        # The frame buffer itself is handed over and a new one is started,
+                        # instead of copying it into a bytes object.
+                        asyncio.run_coroutine_threadsafe(
+                            frame_queue.put(complete_frame_data), loop).result()
+                        complete_frame_data = bytearray()
+                    elif is_skipping_frames or frame_queue.full():
+                        # The client has fallen behind, instead of blocking FFMPEG (which
+                        # adds up to the whole pipe of latency), the delta frames are
+                        # dropped until the next key frame.
+                        is_skipping_frames = True
+                        complete_frame_data.clear()
+                    else:
+                        asyncio.run_coroutine_threadsafe(
+                            frame_queue.put(complete_frame_data), loop).result()
+                        complete_frame_data = bytearray()
+
+                    key_frame_start = None
+
+                if key_frame_start is None and nal_type in (5, 7):
+                    key_frame_start = len(complete_frame_data)
+
+                # Add all the data from the start of this match, till (but not including) the
+                # start of the next match, or till the carried bytes if this is the last
+                # match.
+                next_nal_start: int = new_encoded_data.find(H264_NAL_START_CODE,
+                                                            nal_start + 4,
+                                                            search_end)
+
+                if next_nal_start == -1:
+                    complete_frame_data.extend(
+                        new_encoded_data_view[nal_start:parsed_data_size])
+                else:
+                    complete_frame_data.extend(new_encoded_data_view[nal_start:next_nal_start])
+
+                nal_start = next_nal_start
+
+            # Move the carried bytes to the start of the buffer, the next read is written
+            # right after them.
+            carried_data_size = new_encoded_data_size - parsed_data_size
+            new_encoded_data[:carried_data_size] = (
+                new_encoded_data[parsed_data_size:new_encoded_data_size])
+    finally:
+        os.close(encoder_output_fd)
+
+        # Let the websocket coroutine know that there are no more frames.
+        if not stop_event.is_set():
+            asyncio.run_coroutine_threadsafe(frame_queue.put(None), loop).result()
+
+
 @APP.websocket("/websocket/kvm-stream")
 async def stream_kvm(websocket: WebSocket) -> Optional[bytes]:
     """KVM streamer with h264 encoding.
@@ -208,164 +916,144 @@ async def stream_kvm(websocket: WebSocket) -> Optional[bytes]:
         await websocket.close()
         return
 
-    ffmpeg_executable_location = "/usr/bin/ffmpeg"
+    ffmpeg_executable_location = FFMPEG_EXECUTABLE_LOCATION
+
+    # Checked up front, since a missing FFMPEG started through taskset only shows up as a
+    # pipe without data.
+    if not os.path.isfile(ffmpeg_executable_location):
+        BACKEND_LOGGER.error(f"The FFMPEG executable is not"
+                             f" found at: {ffmpeg_executable_location}")
+        BACKEND_LOGGER.error("Exiting the KVM stream process.")
+        await websocket.close()
+        return
+
+    h264_encoder_arguments: List[str] = await asyncio.get_running_loop().run_in_executor(
+        None, get_h264_encoder_arguments)
 
     ffmpeg_command = [
         ffmpeg_executable_location,
         '-f', 'v4l2',
         '-i', '/dev/' + kvm_device_name,
-        '-s', '1920x1080',
-        '-c:v', 'libx264',
-        '-preset', 'ultrafast',
-        '-tune', 'zerolatency',
-        '-profile:v', 'high',
-        '-level', '4',
-        '-pix_fmt', 'yuv420p',
+        *h264_encoder_arguments,
+        # Raw annexure b is kept instead of a container with framed nal units (mpegts,
+        # fragmented mp4), since the client feeds every message straight to a WebCodecs
+        # VideoDecoder configured for annexure b access units.
         '-f', 'h264',
         '-'
     ]
 
+    if ENCODER_CPUS:
+        encoder_cpu_list: str = ",".join(str(cpu) for cpu in sorted(ENCODER_CPUS))
+
+        # Match the encoder threads to the cpus it is pinned to.
+        ffmpeg_command[-1:-1] = ['-threads', str(len(ENCODER_CPUS))]
+        ffmpeg_command = [TASKSET_EXECUTABLE_LOCATION, '-c', encoder_cpu_list, *ffmpeg_command]
+
+    # The output pipe is created here instead of using an asyncio StreamReader, so that it
+    # can be enlarged and read straight into a reused buffer by the reader thread.
+    encoder_output_fd, encoder_input_fd = os.pipe()
+
+    if fcntl is not None and hasattr(fcntl, "F_SETPIPE_SZ"):
+        try:
+            fcntl.fcntl(encoder_output_fd, fcntl.F_SETPIPE_SZ, ENCODER_PIPE_SIZE)
+        except OSError as error:
+            BACKEND_LOGGER.warning(f"Couldn't enlarge the FFMPEG output pipe: {error}")
+
     # Start the FFMPEG process.
     try:
         encoder_process_interface = await asyncio.create_subprocess_exec(
             *ffmpeg_command,
-            stdout=subprocess.PIPE,
+            stdout=encoder_input_fd,
             stderr=subprocess.DEVNULL,
             bufsize=0)
     except FileNotFoundError:
         BACKEND_LOGGER.error(f"The FFMPEG executable is not"
                              f" found at: {ffmpeg_executable_location}")
         BACKEND_LOGGER.error("Exiting the KVM stream process.")
+        os.close(encoder_output_fd)
         await websocket.close()
         return
     except Exception as error:
         BACKEND_LOGGER.error(f"An unexpected error occurred: {error}")
         BACKEND_LOGGER.error("Exiting the KVM stream process.")
+        os.close(encoder_output_fd)
         await websocket.close()
         return
+    finally:
+        # The write end of the pipe is owned by FFMPEG, closing it here lets the reads
+        # return end of file once FFMPEG exits.
+        os.close(encoder_input_fd)
 
     BACKEND_LOGGER.info(f"FFMPEG Process to Encode KVM stream has been "
                         f"started with process id: {encoder_process_interface.pid}")
 
-    complete_frame_data: bytes = b""
-
-    # Define the regex pattern.
-    nal_start_code_pattern: Pattern[bytes] = re.compile(b'(?:\x00\x00\x00\x01)')
+    frame_queue: asyncio.Queue = asyncio.Queue(maxsize=FRAME_QUEUE_SIZE)
+    stop_event: threading.Event = threading.Event()
 
-    while True:
-        try:
-            # Read 300 KB (307200 bytes) of data, this will read at most 300KB, if less data
-            # is available it will return only those available data, and will not wait
-            # for complete 300KB. This number is based on trail and error
-            # the maximum IDR frame size was around 280KB.
-            new_encoded_data: bytes = await encoder_process_interface.stdout.read(307200)
-        except Exception as error:
-            BACKEND_LOGGER.error("Error while reading from FFMPEG process pipeline.")
-            BACKEND_LOGGER.error(error)
-            BACKEND_LOGGER.error("Exiting from the KVM Stream.")
-            break
-
-        if not new_encoded_data:
-            BACKEND_LOGGER.error("There is no data from FFMPEG process, exiting the stream.")
-            break
+    reader_thread: threading.Thread = threading.Thread(
+        target=read_encoded_kvm_frames,
+        args=(encoder_output_fd, frame_queue, asyncio.get_running_loop(), stop_event),
+        daemon=True)
+    reader_thread.start()
 
-        # Find all non-overlapping matches.
-        nal_matches_info: list = list(nal_start_code_pattern.finditer(new_encoded_data))
+    # The cleanup also runs if the coroutine is cancelled, otherwise FFMPEG keeps running
+    # and the reader thread waits forever for space in the queue.
+    try:
+        while True:
+            complete_frame_data: Optional[bytearray] = await frame_queue.get()
 
-        no_of_nal_units: int = len(nal_matches_info)
+            # The reader thread has stopped, the reason is logged by the thread.
+            if complete_frame_data is None:
+                break
 
-        # If there were no matches, it means the current chunk of data has intermediary
-        # Bytes which continues from previous data, hence they should simply be added to the
-        # Existing nal data and skip the remaining code.
-        if not nal_matches_info:
-            complete_frame_data += new_encoded_data
-            continue
+            try:
+                # The uvicorn websocket implementations accept any bytes like object, hence
+                # the frame is sent without converting it to bytes.
+                await websocket.send_bytes(complete_frame_data)
+            except WebSocketDisconnect:
+                BACKEND_LOGGER.error("The Client has disconnected,"
+                                     " exiting from the KVM stream.")
+                break
+            except Exception as error:
+                BACKEND_LOGGER.error("Error while sending data to the client.")
+                BACKEND_LOGGER.error(error)
+                BACKEND_LOGGER.error("Exiting from the KVM Stream.")
+                break
+    finally:
+        stop_event.set()
+        BACKEND_LOGGER.info("Terminating the FFMPEG process pipeline.")
+        try:
+            encoder_process_interface.terminate()
+            BACKEND_LOGGER.info("Terminated.")
+        except Exception:
+            BACKEND_LOGGER.warning("Couldn't terminate the process.")
 
-        for match_index, match in enumerate(nal_matches_info):
-            nal_type: int = new_encoded_data[match.end()] & 0x1F
-
-            # If the first match in the list of matches occurs somewhere not in the first index
-            # Then first few bytes (before the start index of the first match) would correspond
-            # To the data from the previous nal unit, hence we need to add them to the
-            # Existing nal data and then send to the client and then clear the buffer.
-            if match_index == 0 and match.start() != 0:
-                complete_frame_data += new_encoded_data[: match.start()]
-
-            if complete_frame_data:
-                # We send only if the current nal is Non-Idr, since other data such as SPS, PPS,
-                # SEI, IDR would actually come as separate chunks, we need to combine them before
-                # sending. The implementation takes care of combining them, but happens only if a
-                # Non-Idr frame comes After the Key Frame (which is a combination of SPS, PPS,
-                # SEI, IDR).
-                if nal_type == 1:
-                    try:
-                        await websocket.send_bytes(complete_frame_data)
-                    except WebSocketDisconnect:
-                        BACKEND_LOGGER.error("The Client has disconnected,"
-                                             " exiting from the KVM stream.")
-                        BACKEND_LOGGER.info("Closing the websocket connection.")
-                        await websocket.close()
-                        BACKEND_LOGGER.info("closed.")
-                        BACKEND_LOGGER.info("Terminating the FFMPEG process pipeline.")
-                        try:
-                            encoder_process_interface.terminate()
-                            BACKEND_LOGGER.info("Terminated.")
-                        except Exception:
-                            BACKEND_LOGGER.warning("Couldn't terminate the process.")
-                        return
-                    except Exception as error:
-                        BACKEND_LOGGER.error("Error while sending data to the client.")
-                        BACKEND_LOGGER.error(error)
-                        BACKEND_LOGGER.error("Exiting from the KVM Stream.")
-                        BACKEND_LOGGER.info("Closing the websocket connection.")
-                        await websocket.close()
-                        BACKEND_LOGGER.info("closed.")
-                        BACKEND_LOGGER.info("Terminating the FFMPEG process pipeline.")
-                        try:
-                            encoder_process_interface.terminate()
-                            BACKEND_LOGGER.info("Terminated.")
-                        except Exception:
-                            BACKEND_LOGGER.warning("Couldn't terminate the process.")
-                        return
+        # Unblock the reader thread if it is waiting for space in the queue, it exits once
+        # it sees the stop event or the end of the FFMPEG output.
+        while not frame_queue.empty():
+            frame_queue.get_nowait()
 
-                    # Yield control back to the event loop to prevent buffer overflow and ensure
-                    # consistent frame rate.
-                    #
-                    # This line addresses two key issues:
-                    # 1. Frame rate regulation: Without this, the client receives frames
-                    # at an excessively high rate (> 3000 FPS).
-                    # 2. Encoder output buffer management: FFMPEG requires periodic buffer
-                    # clearance to output data. If the event loop is not yielded, the buffer
-                    # will not be cleared, causing the code to hang
-                    # at `await encoder_process_interface.stdout.read(307200)`.
-                    await asyncio.sleep(0)
-                    complete_frame_data = b''
-
-            # If this is the last item in the list of matches, then we add all the data
-            # From the start of its index till the end.
-            if match_index == no_of_nal_units - 1:
-                complete_frame_data += new_encoded_data[match.start():]
-            else:
-                # If this is not the last item in the list of matches, then we add all the data
-                # From the start of the index, till (but not including) the start of the next
-                # Match.
-                next_nal_index = match_index + 1
-                next_nal_start = nal_matches_info[next_nal_index].start()
-                complete_frame_data += new_encoded_data[match.start():next_nal_start]
-
-    BACKEND_LOGGER.info("Closing the websocket connection.")
-    await websocket.close()
-    BACKEND_LOGGER.info("closed.")
-    BACKEND_LOGGER.info("Terminating the FFMPEG process pipeline.")
-    try:
-        encoder_process_interface.terminate()
-        BACKEND_LOGGER.info("Terminated.")
-    except Exception:
-        BACKEND_LOGGER.warning("Couldn't terminate the process.")
+        BACKEND_LOGGER.info("Closing the websocket connection.")
+        try:
+            await websocket.close()
+            BACKEND_LOGGER.info("closed.")
+        except Exception as error:
+            BACKEND_LOGGER.warning(f"Couldn't close the websocket connection: {error}")
 
 
 if __name__ == "__main__":
-    config = uvicorn.Config(app=APP, host="0.0.0.0", port=5566, log_level="info")
+    config = uvicorn.Config(app=APP,
+                            host="0.0.0.0",
+                            port=5566,
+                            log_level="info",
+                            # The streams are long lived, an access log line per request
+                            # only adds work to the event loop.
+                            access_log=False,
+                            timeout_keep_alive=65)
+
+    if SERVER_CPUS:
+        # Pin the server before uvicorn starts, so every thread it creates inherits this.
+        os.sched_setaffinity(0, SERVER_CPUS)
 
     server = uvicorn.Server(config)
     server.run()